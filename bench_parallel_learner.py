@@ -0,0 +1,70 @@
+## Scaling benchmark for parallel_learner: learner updates per second against the number of processes P
+## Usage: python bench_parallel_learner.py --procs 1 2 4 --batch-size 1024 --updates 200
+
+import argparse
+import time
+
+import numpy as np
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from parallel_learner import ParallelAgent, init_learner, run_learners
+
+STATE_SIZE = 24         # Tennis observation size (3 stacked frames of 8 variables)
+ACTION_SIZE = 2         # Tennis action size
+NUM_AGENTS = 2
+
+
+def bench(rank, world_size, args, results):
+    """Entry point of one learner process."""
+    init_learner(rank, world_size, master_port=args.port)
+    agent = ParallelAgent(NUM_AGENTS, STATE_SIZE, ACTION_SIZE, random_seed=1, rank=rank, world_size=world_size,
+                          batch_size=args.batch_size, buffer_size=args.fill)
+
+    if rank > 0:
+        agent.serve()
+        agent.in_sync()
+        dist.destroy_process_group()
+        return
+
+    # Fill the replay buffer with random transitions
+    for _ in range(args.fill):
+        agent.memory.add(np.random.randn(STATE_SIZE), np.random.uniform(-1, 1, ACTION_SIZE),
+                         np.random.choice([0., 0.1, -0.01]), np.random.randn(STATE_SIZE), False)
+
+    for _ in range(args.warmup):
+        agent.learn(agent.memory.sample(), agent.gamma)
+
+    start = time.time()
+    for _ in range(args.updates):
+        agent.learn(agent.memory.sample(), agent.gamma)
+    elapsed = time.time() - start
+
+    agent.stop()
+    results.put((world_size, args.updates / elapsed, agent.in_sync()))
+    dist.destroy_process_group()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Learner updates per second against P')
+    parser.add_argument('--procs', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--updates', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--fill', type=int, default=10000)
+    parser.add_argument('--port', default='29500')
+    args = parser.parse_args()
+
+    ctx = mp.get_context('spawn')
+    results = ctx.SimpleQueue()
+    baseline = None
+    print('{:>5} {:>12} {:>9} {:>8}'.format('P', 'updates/s', 'speedup', 'in sync'))
+    for world_size in args.procs:
+        run_learners(world_size, bench, args, results, master_port=args.port)
+        procs, rate, synced = results.get()
+        baseline = baseline or rate
+        print('{:>5d} {:>12.1f} {:>8.2f}x {:>8}'.format(procs, rate, rate / baseline, str(synced)))
+
+
+if __name__ == '__main__':
+    main()
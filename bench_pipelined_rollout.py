@@ -0,0 +1,52 @@
+## Steps per second of the sequential ddpg loop against the pipelined rollout of pipelined_rollout
+## Uses standin_env by default, pass --env Tennis.app to measure with Unity.
+## Usage: python bench_pipelined_rollout.py --episodes 50 --sim-time 0.002
+
+import argparse
+
+from ddpg_agent_updated_v2 import Agent
+from pipelined_rollout import PipelinedTrainer
+from standin_env import StandInEnv
+
+
+def make_env(args):
+    if args.env:
+        from unityagents import UnityEnvironment
+        return UnityEnvironment(file_name=args.env)
+    return StandInEnv(sim_time=args.sim_time, seed=0)
+
+
+def bench(env, args, pipelined, max_staleness):
+    brain_name = env.brain_names[0]
+    env_info = env.reset(train_mode=True)[brain_name]
+    num_agents = len(env_info.agents)
+    state_size = env_info.vector_observations.shape[1]
+    action_size = env.brains[brain_name].vector_action_space_size
+
+    agents = Agent(num_agents=num_agents, state_size=state_size, action_size=action_size, random_seed=1, gamma=0.99, tau=8e-2, lr_actor=2e-4, lr_critic=2e-3, weight_decay=0., mu=0., theta=0.12, sigma=0.2, learn_rate=10, time_update=10, batch_size=args.batch_size, buffer_size=int(1e5))
+    trainer = PipelinedTrainer(env, brain_name, agents, max_staleness=max_staleness, pipelined=pipelined)
+    trainer.run(max_episodes=args.episodes, print_every=args.episodes + 1, name='-bench')
+    return trainer.steps_per_second(), trainer.updates, trainer.max_seen_staleness
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sequential against pipelined rollout')
+    parser.add_argument('--episodes', type=int, default=50)
+    parser.add_argument('--sim-time', type=float, default=0.002, help='seconds per step of the stand-in environment')
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--staleness', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--env', default=None, help='path to the Tennis environment instead of the stand-in')
+    args = parser.parse_args()
+
+    env = make_env(args)
+    print('{:<22} {:>10} {:>9} {:>10} {:>9}'.format('mode', 'steps/s', 'speedup', 'updates', 'max lag'))
+    baseline, updates, lag = bench(env, args, False, 1)
+    print('{:<22} {:>10.1f} {:>8.2f}x {:>10d} {:>9d}'.format('sequential', baseline, 1., updates, lag))
+    for max_staleness in args.staleness:
+        rate, updates, lag = bench(env, args, True, max_staleness)
+        print('{:<22} {:>10.1f} {:>8.2f}x {:>10d} {:>9d}'.format('pipelined staleness={}'.format(max_staleness), rate, rate / baseline, updates, lag))
+    env.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+## Load generator for policy_server: C concurrent clients, each sending one observation at a time
+## The server runs in its own subprocess and every client in its own process with PolicyClient, so the reported
+## latencies do not include client scheduling or GIL contention with the server's forward thread.
+## Reports client side p50 / p99 latency and throughput for several batching windows.
+## Usage: python bench_policy_server.py --clients 1 8 32 --delays 0 0.001 0.005
+
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from policy_server import PolicyClient, percentile
+
+SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'policy_server.py')
+
+
+def connect(args, timeout=30.):
+    """Returns a PolicyClient once the server accepts connections."""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return PolicyClient(port=args.port, path=args.unix)
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def client(job):
+    """Closed loop client: sends the next observation as soon as the previous action comes back."""
+    args, seed = job
+    policy = connect(args)
+    rng = np.random.RandomState(seed)
+    latencies = []
+    deadline = time.perf_counter() + args.duration
+    while True:
+        start = time.perf_counter()
+        if start > deadline:
+            break
+        policy.act(rng.randn(args.state_size))
+        latencies.append(time.perf_counter() - start)
+    policy.close()
+    return latencies
+
+
+def run(args, clients, delay):
+    command = [sys.executable, SERVER, '--checkpoint', args.checkpoint, '--state-size', str(args.state_size),
+               '--action-size', str(args.action_size), '--max-batch', str(args.max_batch), '--max-delay', str(delay),
+               '--reload-interval', '0', '--report-every', '3600', '--port', str(args.port)]
+    if args.unix:
+        command += ['--unix', args.unix]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    try:
+        connect(args).close()
+        with multiprocessing.Pool(clients) as pool:
+            results = pool.map(client, [(args, seed) for seed in range(clients)])
+        stats = connect(args)
+        mean_batch = stats.stats()[3]
+        stats.close()
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = [latency for result in results for latency in result]
+    return percentile(latencies, 50), percentile(latencies, 99), len(latencies) / args.duration, mean_batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Latency and throughput of the policy server')
+    parser.add_argument('--checkpoint', default='checkpoint_actor.pth')
+    parser.add_argument('--state-size', type=int, default=24)
+    parser.add_argument('--action-size', type=int, default=2)
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--delays', type=float, nargs='+', default=[0., 0.001, 0.005])
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--duration', type=float, default=5.)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='path of a Unix socket, used instead of TCP')
+    args = parser.parse_args()
+
+    print('{:>8} {:>9} {:>9} {:>9} {:>10} {:>11}'.format('clients', 'delay ms', 'p50 ms', 'p99 ms', 'req/s', 'mean batch'))
+    for clients in args.clients:
+        for delay in args.delays:
+            p50, p99, throughput, mean_batch = run(args, clients, delay)
+            print('{:>8d} {:>9.1f} {:>9.2f} {:>9.2f} {:>10.0f} {:>11.1f}'.format(
+                clients, delay * 1e3, p50, p99, throughput, mean_batch))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+## Benchmark of ReplayBuffer against RewardIndexedReplayBuffer
+## Sampling cost and share of rewarding transitions per batch always run on synthetic Tennis-like data.
+## Episodes-to-solve needs the Unity environment: python bench_replay.py --env Tennis.app
+
+import argparse
+import time
+
+import numpy as np
+
+from ddpg_agent_updated_v2 import Agent, ReplayBuffer, RewardIndexedReplayBuffer
+
+STATE_SIZE = 24
+ACTION_SIZE = 2
+HIT_PROB = 0.01         # share of +0.1 transitions in early Tennis training
+DROP_PROB = 0.005       # share of -0.01 (terminal) transitions
+
+
+def fill(memory, n, rng):
+    for _ in range(n):
+        u = rng.rand()
+        reward = 0.1 if u < HIT_PROB else -0.01 if u < HIT_PROB + DROP_PROB else 0.
+        memory.add(rng.randn(STATE_SIZE), rng.uniform(-1, 1, ACTION_SIZE), reward,
+                   rng.randn(STATE_SIZE), reward < 0)
+
+
+def bench_sampling(args):
+    rng = np.random.RandomState(0)
+    buffers = [('uniform deque', ReplayBuffer(ACTION_SIZE, args.buffer_size, args.batch_size, 0))]
+    for fraction in args.fractions:
+        buffers.append(('indexed f={:.2f}'.format(fraction),
+                        RewardIndexedReplayBuffer(ACTION_SIZE, args.buffer_size, args.batch_size, 0, reward_fraction=fraction)))
+
+    print('{:<18} {:>10} {:>12} {:>14}'.format('buffer', 'add us', 'sample us', 'signal/batch'))
+    for label, memory in buffers:
+        start = time.time()
+        fill(memory, args.fill, rng)
+        add_us = (time.time() - start) / args.fill * 1e6
+
+        signal = 0.
+        start = time.time()
+        for _ in range(args.samples):
+            _, _, rewards, _, dones = memory.sample()
+            signal += float(((rewards != 0) | (dones > 0)).float().mean())
+        sample_us = (time.time() - start) / args.samples * 1e6
+        print('{:<18} {:>10.2f} {:>12.1f} {:>14.3f}'.format(label, add_us, sample_us, signal / args.samples))
+
+
+def bench_solve(args):
+    from unityagents import UnityEnvironment
+    from ddpg_train import ddpg, episodes_to_solve
+
+    env = UnityEnvironment(file_name=args.env)
+    brain_name = env.brain_names[0]
+    env_info = env.reset(train_mode=True)[brain_name]
+    num_agents = len(env_info.agents)
+    state_size = env_info.vector_observations.shape[1]
+    action_size = env.brains[brain_name].vector_action_space_size
+
+    for fraction in [0.] + args.fractions:
+        agents = Agent(num_agents=num_agents, state_size=state_size, action_size=action_size, random_seed=1, gamma=0.99, tau=8e-2, lr_actor=2e-4, lr_critic=2e-3, weight_decay=0., mu=0., theta=0.12, sigma=0.2, learn_rate=10, time_update=10, batch_size=args.batch_size, buffer_size=args.buffer_size, reward_fraction=fraction)
+        start = time.time()
+        _, mean_scores = ddpg(env, brain_name, agents, name='-bench', max_episodes=args.max_episodes)
+        print('\nreward_fraction={:.2f}: solved in {} episodes ({:.0f} s)'.format(fraction, episodes_to_solve(mean_scores), time.time() - start))
+    env.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay sampling cost and episodes to solve')
+    parser.add_argument('--fractions', type=float, nargs='+', default=[0.1, 0.25, 0.5])
+    parser.add_argument('--buffer-size', type=int, default=int(1e5))
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--fill', type=int, default=int(1e5))
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--env', default=None, help='path to the Tennis environment, enables the episodes-to-solve run')
+    parser.add_argument('--max-episodes', type=int, default=3000)
+    args = parser.parse_args()
+
+    bench_sampling(args)
+    if args.env:
+        bench_solve(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -29,7 +29,7 @@ device = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 class Agent():
     """Interacts with and learns from the environment."""
     
-    def __init__(self, num_agents,state_size, action_size, random_seed, gamma=GAMMA, tau= TAU, lr_actor=LR_ACTOR, lr_critic=LR_CRITIC, weight_decay=WEIGHT_DECAY, mu=0., theta=0.15, sigma=0.2, learn_rate=LEARNING_RATE, time_update = TIME_UPDATE, batch_size = BATCH_SIZE, buffer_size = BUFFER_SIZE):
+    def __init__(self, num_agents,state_size, action_size, random_seed, gamma=GAMMA, tau= TAU, lr_actor=LR_ACTOR, lr_critic=LR_CRITIC, weight_decay=WEIGHT_DECAY, mu=0., theta=0.15, sigma=0.2, learn_rate=LEARNING_RATE, time_update = TIME_UPDATE, batch_size = BATCH_SIZE, buffer_size = BUFFER_SIZE, reward_fraction = 0.):
         """Initialize an Agent object.
         
         Params
@@ -50,6 +50,7 @@ class Agent():
             time_update (int)   : Number of time steps without update
             batch_size (int)    : Memory sample batch size
             buffer_size (int)   : Memory buffer size
+            reward_fraction (float): Minimum fraction of each batch drawn (with replacement) from rewarding / terminal transitions, once there is at least one (0 = uniform replay)
         """
 
         self.state_size=state_size
@@ -68,6 +69,7 @@ class Agent():
         self.num_agents=num_agents
         self.batch_size = batch_size
         self.buffer_size = buffer_size
+        self.reward_fraction = reward_fraction
 
         # Actor Network (w/ Target Network)
         self.actor_local = Actor(state_size, action_size, random_seed).to(device)
@@ -83,21 +85,32 @@ class Agent():
         self.noise = OUNoise((num_agents, action_size), random_seed)
 
         # Replay memory
-        self.memory = ReplayBuffer(action_size, self.buffer_size, self.batch_size, random_seed)
+        if self.reward_fraction > 0:
+            self.memory = RewardIndexedReplayBuffer(action_size, self.buffer_size, self.batch_size, random_seed, reward_fraction=self.reward_fraction)
+        else:
+            self.memory = ReplayBuffer(action_size, self.buffer_size, self.batch_size, random_seed)
     
     def step(self, time_step, state, action, reward, next_state, done):
         """Save experience in replay memory, and use random sample from buffer to learn."""
         
-        # Save experience / reward for each agent
-        # The memory is shared and hence we are recording to the same place for all the agents
-        for i in range(self.num_agents):
-            self.memory.add(state[i,:], action[i,:], reward[i], next_state[i,:], done[i])
+        self.remember(state, action, reward, next_state, done)
 
         # check if it's time to learn or not
         if time_step % self.time_update > 0:
             return
 
-        # Learn, if enough samples are available in memory and learn as many times as the updates
+        self.update()
+
+    def remember(self, state, action, reward, next_state, done):
+        """Save the experience of every agent in replay memory."""
+
+        # Save experience / reward for each agent
+        # The memory is shared and hence we are recording to the same place for all the agents
+        for i in range(self.num_agents):
+            self.memory.add(state[i,:], action[i,:], reward[i], next_state[i,:], done[i])
+
+    def update(self):
+        """Learn, if enough samples are available in memory and learn as many times as the updates."""
         if len(self.memory) > self.batch_size:
             for i in range(self.learning_rate):
                 experiences = self.memory.sample()
@@ -108,14 +121,11 @@ class Agent():
         """Returns actions for given state as per current policy."""
 
         states = torch.from_numpy(states).float().to(device)
-        actions = np.zeros((self.num_agents, self.action_size))
         self.actor_local.eval()
         
-        # Per agent action
+        # One forward pass for all the agents
         with torch.no_grad():
-            for agent_id, state in enumerate(states):
-                action = self.actor_local(state).cpu().data.numpy()
-                actions[agent_id, :] = action
+            actions = self.actor_local(states).cpu().data.numpy().astype(np.float64)
 
         self.actor_local.train()
         
@@ -162,6 +172,7 @@ class Agent():
         # Minimize the loss
         self.critic_optimizer.zero_grad()
         critic_loss.backward()
+        self.reduce_gradients(self.critic_local)
         self.critic_optimizer.step()
 
         # ---------------------------- update actor ---------------------------- #
@@ -172,12 +183,22 @@ class Agent():
         # Minimize the loss
         self.actor_optimizer.zero_grad()
         actor_loss.backward()
+        self.reduce_gradients(self.actor_local)
         self.actor_optimizer.step()
 
         # ----------------------- update target networks ----------------------- #
         self.soft_update(self.critic_local, self.critic_target, self.tau)
         self.soft_update(self.actor_local, self.actor_target, self.tau)                     
 
+    def reduce_gradients(self, model):
+        """Hook called between backward() and the optimizer step.
+        A single process learner has nothing to combine, see parallel_learner.ParallelAgent
+        Params
+        ======
+            model: PyTorch model whose gradients were just computed
+        """
+        pass
+
     def soft_update(self, local_model, target_model, tau):
         """Soft update model parameters.
         θ_target = τ*θ_local + (1 - τ)*θ_target
@@ -249,4 +270,108 @@ class ReplayBuffer:
 
     def __len__(self):
         """Return the current size of internal memory."""
-        return len(self.memory)
\ No newline at end of file
+        return len(self.memory)
+
+
+class RewardIndexedReplayBuffer:
+    """Fixed-size ring buffer that keeps an index of the transitions carrying signal.
+
+    In Tennis almost every reward is 0, so a uniform batch rarely contains a hit (+0.1) or a drop (-0.01).
+    Transitions with a non-zero reward or a terminal flag are tracked in a dense index that is updated in O(1)
+    when they are written or overwritten, and every batch is guaranteed a fraction of them as soon as the index
+    is not empty (drawn with replacement, so early on the same few transitions repeat). This is a much
+    cheaper alternative to full prioritized replay: no priorities, no sum tree, no importance weights.
+    """
+
+    def __init__(self, action_size, buffer_size, batch_size, seed, reward_fraction=0.25):
+        """Initialize a RewardIndexedReplayBuffer object.
+        Params
+        ======
+            action_size (int): dimension of each action
+            buffer_size (int): maximum size of buffer
+            batch_size (int): size of each training batch
+            seed (int): random seed
+            reward_fraction (float): fraction of each batch drawn from the rewarding / terminal index
+        """
+        self.action_size = action_size
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.reward_fraction = reward_fraction
+        self.rng = np.random.RandomState(seed)
+
+        # Storage is allocated on the first add, once the state size is known
+        self.states = None
+        self.position = 0                                       # next slot to write
+        self.size = 0
+
+        # Dense list of rewarding slots plus the position of each slot in it (-1 if absent)
+        self.signal = np.zeros(buffer_size, dtype=np.int64)
+        self.signal_pos = np.full(buffer_size, -1, dtype=np.int64)
+        self.num_signal = 0
+
+    def _allocate(self, state):
+        state_size = np.size(state)
+        self.states = np.zeros((self.buffer_size, state_size), dtype=np.float32)
+        self.actions = np.zeros((self.buffer_size, self.action_size), dtype=np.float32)
+        self.rewards = np.zeros((self.buffer_size, 1), dtype=np.float32)
+        self.next_states = np.zeros((self.buffer_size, state_size), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, 1), dtype=np.float32)
+
+    def _index_add(self, slot):
+        self.signal[self.num_signal] = slot
+        self.signal_pos[slot] = self.num_signal
+        self.num_signal += 1
+
+    def _index_remove(self, slot):
+        # Move the last entry into the hole left by slot
+        pos = self.signal_pos[slot]
+        last = self.signal[self.num_signal - 1]
+        self.signal[pos] = last
+        self.signal_pos[last] = pos
+        self.signal_pos[slot] = -1
+        self.num_signal -= 1
+
+    def add(self, state, action, reward, next_state, done):
+        """Add a new experience to memory, overwriting the oldest one when full."""
+        if self.states is None:
+            self._allocate(state)
+
+        slot = self.position
+        if self.signal_pos[slot] >= 0:
+            self._index_remove(slot)
+
+        self.states[slot] = state
+        self.actions[slot] = action
+        self.rewards[slot] = reward
+        self.next_states[slot] = next_state
+        self.dones[slot] = done
+
+        if reward != 0 or done:
+            self._index_add(slot)
+
+        self.position = (slot + 1) % self.buffer_size
+        self.size = min(self.size + 1, self.buffer_size)
+
+    def sample_indices(self):
+        """Returns the slots of one batch: a share from the rewarding index, the rest uniform."""
+        # Drawn with replacement, so the share holds even while the index has fewer entries than the quota
+        num_signal = min(int(np.ceil(self.reward_fraction * self.batch_size)), self.batch_size) if self.num_signal else 0
+        signal = self.signal[self.rng.randint(0, self.num_signal, size=num_signal)] if num_signal else np.zeros(0, dtype=np.int64)
+        uniform = self.rng.randint(0, self.size, size=self.batch_size - num_signal)
+        return np.concatenate((signal, uniform))
+
+    def sample(self):
+        """Sample a batch of experiences from memory."""
+        idx = self.sample_indices()
+
+        states = torch.from_numpy(self.states[idx]).float().to(device)
+        actions = torch.from_numpy(self.actions[idx]).float().to(device)
+        rewards = torch.from_numpy(self.rewards[idx]).float().to(device)
+        next_states = torch.from_numpy(self.next_states[idx]).float().to(device)
+        dones = torch.from_numpy(self.dones[idx]).float().to(device)
+
+        return (states, actions, rewards, next_states, dones)
+
+    def __len__(self):
+        """Return the current size of internal memory."""
+        return self.size
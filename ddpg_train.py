@@ -0,0 +1,99 @@
+## Training loop of Tennis.ipynb moved into a module so that scripts and benchmarks can share it
+## The notebook loop used the globals env, brain_name and agents, here they are passed in
+
+import time
+from collections import deque
+
+import numpy as np
+
+SOLVED_SCORE = 0.5      # average of the max score over 100 episodes needed to solve Tennis
+
+
+def ddpg(env, brain_name, agents, print_every=100, name='', max_episodes=None, max_t=2000, recorder=None):
+    ''' DDPG Algorithm
+
+        Params
+            env (UnityEnvironment): environment to train in
+            brain_name (str): name of the brain controlled by agents
+            agents (Agent): agent acting for every agent of the brain
+            print_every (int) : frequency of printing information throughout iteration
+            name (str): suffix of the checkpoint files
+            max_episodes (int): stop after this many episodes even if not solved (None = until solved)
+            max_t (int): maximum number of timesteps per episode
+            recorder (TrajectoryRecorder): if given, every transition is also streamed to disk
+    '''
+
+    individual_max_scores = []                                      # Max scores from each episode
+    mean_scores = []
+    scores_window = deque(maxlen=print_every)
+    times_window = deque(maxlen=print_every)
+
+    num_agents = agents.num_agents
+    i_episode = 0
+
+    while max_episodes is None or i_episode < max_episodes:
+
+        i_episode += 1
+
+        env_info = env.reset(train_mode=True)[brain_name]     # Reset the environment
+        states = env_info.vector_observations                 # Get the current states (for each agent)
+
+        agents.reset()
+
+        scores = np.zeros(num_agents)                         # Reset the score
+        start_time = time.time()                              # Record start time
+
+        t = 0
+        while t <= max_t:
+            actions = agents.act(states)                      # Action for the state
+            env_info = env.step(actions)[brain_name]          # Get the new details of the environment
+
+            next_states = env_info.vector_observations        # Get the next state
+            rewards = env_info.rewards                        # Get the reward
+            dones = env_info.local_done                       # Get the done value
+
+            agents.step(t, states, actions, rewards, next_states, dones)
+            if recorder is not None:
+                recorder.record(i_episode, t, states, actions, rewards, next_states, dones)
+
+            states = next_states
+            scores += rewards
+
+            t += 1
+
+            # Check if the episode is done
+            if np.any(dones):
+                break
+
+        # The score of an episode is the max over the agents of their undiscounted returns
+        last_max = np.max(scores)
+        individual_max_scores.append(last_max)
+        scores_window.append(last_max)
+
+        # add the time for this episode to the sliding window
+        times_window.append(time.time()-start_time)
+
+        # The mean of the scores window
+        last_mean = np.mean(scores_window)
+        mean_scores.append(last_mean)
+
+        print('\rEpisode {}\tEpisode Mean: {:.2f}\tSliding Max: {:.2f}\tNon-zero Count: {:d}\tAverage Score: {:.4f}'.format(i_episode, np.mean(scores), np.max(scores_window), np.count_nonzero(scores_window),last_mean), end="")
+        agents.save(name)
+
+        if i_episode % print_every == 0:
+            print('\rEpisode {}\tEpisode Mean: {:.2f}\tSliding Max: {:.2f}\tNon-zero Count: {:d}\tAverage Score: {:.4f}'.format(i_episode, np.mean(scores), np.max(scores_window), np.count_nonzero(scores_window),last_mean))
+
+        if last_mean > SOLVED_SCORE and i_episode > 100:
+            print('\nEnvironment solved in {:d} episodes!\tAverage Score: {:.2f}'.format(i_episode, last_mean))
+            agents.save(name)
+            break
+
+    return individual_max_scores, mean_scores
+
+
+def episodes_to_solve(mean_scores):
+    """Returns the first episode whose 100 episode average exceeds SOLVED_SCORE, or None."""
+    for i_episode, mean in enumerate(mean_scores, start=1):
+        if mean > SOLVED_SCORE and i_episode > 100:
+            return i_episode
+    return None
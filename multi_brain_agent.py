@@ -0,0 +1,131 @@
+## Manager for environments with several brains, such as Soccer (goalie and striker brains, two agents each)
+## One DDPG Agent per brain: each brain has its own actor / critic and its own replay memory, while a single
+## scheduler decides when every brain learns. Actions of all the agents of a brain come from one forward pass.
+
+import numpy as np
+
+from ddpg_agent_updated_v2 import Agent, TIME_UPDATE
+
+DISCRETE = 'discrete'
+CONTINUOUS = 'continuous'
+
+
+class BrainSpec():
+    """Sizes of one brain of the environment."""
+
+    def __init__(self, num_agents, state_size, action_size, action_type=CONTINUOUS):
+        """Initialize a BrainSpec object.
+        Params
+        ======
+            num_agents (int)  : number of agents controlled by the brain
+            state_size (int)  : dimension of the observation of each agent
+            action_size (int) : dimension of each action (number of choices for a discrete brain)
+            action_type (str) : 'discrete' or 'continuous'
+        """
+        self.num_agents = num_agents
+        self.state_size = state_size
+        self.action_size = action_size
+        self.action_type = action_type
+
+
+class MultiBrainAgent():
+    """Keeps one Agent per brain and speaks the per-brain dicts of the Unity API."""
+
+    def __init__(self, specs, random_seed, time_update=TIME_UPDATE, **kwargs):
+        """Initialize a MultiBrainAgent object.
+
+        Params
+        ======
+            specs (dict)        : brain name -> BrainSpec
+            random_seed (int)   : random seed
+            time_update (int)   : Number of time steps without update, shared by all the brains
+            kwargs              : remaining Agent hyperparameters, used for every brain
+        """
+        self.specs = specs
+        self.brain_names = list(specs)
+        self.time_update = time_update
+        self.agents = {}
+        for brain_name, spec in specs.items():
+            self.agents[brain_name] = Agent(spec.num_agents, spec.state_size, spec.action_size, random_seed, time_update=time_update, **kwargs)
+
+    @classmethod
+    def from_env(cls, env, random_seed, **kwargs):
+        """Build a MultiBrainAgent for every brain of a UnityEnvironment."""
+        env_info = env.reset(train_mode=True)
+        specs = {}
+        for brain_name in env.brain_names:
+            brain = env.brains[brain_name]
+            specs[brain_name] = BrainSpec(len(env_info[brain_name].agents),
+                                          env_info[brain_name].vector_observations.shape[1],
+                                          brain.vector_action_space_size,
+                                          brain.vector_action_space_type)
+        return cls(specs, random_seed, **kwargs)
+
+    def act(self, states, add_noise=True):
+        """Returns the continuous actions of every brain as per current policies.
+        Params
+        ======
+            states (dict): brain name -> (num_agents, state_size) observations
+        """
+        return {brain_name: agent.act(states[brain_name], add_noise) for brain_name, agent in self.agents.items()}
+
+    def env_actions(self, actions):
+        """Turn the output of act() into the action dict expected by env.step.
+        A discrete brain takes the choice with the highest actor output.
+        """
+        env_actions = {}
+        for brain_name, action in actions.items():
+            if self.specs[brain_name].action_type == DISCRETE:
+                env_actions[brain_name] = np.argmax(action, axis=1)
+            else:
+                env_actions[brain_name] = action
+        return env_actions
+
+    def executed_actions(self, actions):
+        """Turn the output of act() into the actions the environment actually executed.
+        A discrete brain stores the one-hot of its argmax choice, so that its critic learns Q on the
+        action that was taken rather than on the noisy continuous actor output.
+        """
+        executed = {}
+        for brain_name, action in actions.items():
+            spec = self.specs[brain_name]
+            if spec.action_type == DISCRETE:
+                executed[brain_name] = np.eye(spec.action_size)[np.argmax(action, axis=1)]
+            else:
+                executed[brain_name] = action
+        return executed
+
+    def step(self, time_step, states, actions, rewards, next_states, dones):
+        """Save the experiences of every brain in its own replay memory, and learn on the shared schedule.
+        All the arguments but time_step are dicts keyed by brain name, actions being the output of act().
+        Discrete brains store the one-hot of the executed choice, see executed_actions().
+        """
+        executed = self.executed_actions(actions)
+        for brain_name, agent in self.agents.items():
+            agent.remember(states[brain_name], executed[brain_name], rewards[brain_name],
+                           next_states[brain_name], dones[brain_name])
+
+        # check if it's time to learn or not
+        if time_step % self.time_update > 0:
+            return
+
+        for agent in self.agents.values():
+            agent.update()
+
+    def reset(self):
+        """Resets the noise of every brain"""
+        for agent in self.agents.values():
+            agent.reset()
+
+    def save(self, name):
+        """Saves the models of every brain"""
+        for brain_name, agent in self.agents.items():
+            agent.save('{}-{}'.format(name, brain_name))
+
+
+def split_env_info(env_info, brain_names):
+    """Returns the per-brain dicts of observations, rewards and dones of an env_info."""
+    states = {b: env_info[b].vector_observations for b in brain_names}
+    rewards = {b: env_info[b].rewards for b in brain_names}
+    dones = {b: env_info[b].local_done for b in brain_names}
+    return states, rewards, dones
@@ -0,0 +1,154 @@
+## Data-parallel learner for the DDPG agent in ddpg_agent_updated_v2
+## Every minibatch is sampled once on rank 0 (which also owns the environment and the replay buffer),
+## broadcast to all learner processes and split into P shards. Gradients of both the actor and the
+## critic are all-reduced before each optimizer step, so every process applies the same update and
+## the local and target networks stay identical without any extra parameter traffic.
+
+import os
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+from ddpg_agent_updated_v2 import Agent
+
+LEARN = 1               # command: a minibatch follows
+STOP = 0                # command: shut the workers down
+
+
+def init_learner(rank, world_size, master_addr='127.0.0.1', master_port='29500', backend='gloo'):
+    """Join the process group of learner processes.
+    Params
+    ======
+        rank (int)        : index of this process (0 drives the environment)
+        world_size (int)  : number of learner processes P
+        master_addr (str) : address of rank 0
+        master_port (str) : port of rank 0
+        backend (str)     : torch.distributed backend, gloo runs on CPU and localhost
+    """
+    os.environ.setdefault('MASTER_ADDR', master_addr)
+    os.environ.setdefault('MASTER_PORT', str(master_port))
+    # Split the cores between the learners instead of letting every process grab all of them
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // world_size))
+    dist.init_process_group(backend, rank=rank, world_size=world_size)
+
+
+def run_learners(world_size, fn, *args, master_port='29500'):
+    """Spawn world_size processes on this host, each calling fn(rank, world_size, *args).
+    Params
+    ======
+        world_size (int)  : number of learner processes P
+        fn (callable)     : entry point, must be a module level function so it can be pickled
+        master_port (str) : port used for the rendezvous
+    """
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(master_port)
+    mp.spawn(fn, args=(world_size,) + args, nprocs=world_size, join=True)
+
+
+def broadcast_parameters(model, src=0):
+    """Copy the parameters of model on rank src to every other rank."""
+    for param in model.parameters():
+        dist.broadcast(param.data, src)
+
+
+def parameters_in_sync(model, atol=0.):
+    """Returns True if model has the same parameters on every rank."""
+    flat = torch.cat([param.data.view(-1) for param in model.parameters()])
+    reference = flat.clone()
+    dist.broadcast(reference, 0)
+    diff = torch.tensor([float((flat - reference).abs().max())])
+    dist.all_reduce(diff, op=dist.ReduceOp.MAX)
+    return diff.item() <= atol
+
+
+class ParallelAgent(Agent):
+    """DDPG agent whose learn() step is sharded across P learner processes."""
+
+    def __init__(self, num_agents, state_size, action_size, random_seed, rank=0, world_size=1, **kwargs):
+        """Initialize a ParallelAgent object. init_learner() must have been called first.
+
+        Params
+        ======
+            num_agents (int)    : Number of agents
+            state_size (int)    : dimension of each state
+            action_size (int)   : dimension of each action
+            random_seed (int)   : random seed
+            rank (int)          : index of this learner process
+            world_size (int)    : number of learner processes
+            kwargs              : remaining Agent hyperparameters, identical on every rank
+        """
+        super(ParallelAgent, self).__init__(num_agents, state_size, action_size, random_seed, **kwargs)
+
+        # An empty shard would give a NaN loss, and the all-reduce would spread it to every rank
+        if self.batch_size < world_size:
+            raise ValueError('batch_size ({}) must be at least world_size ({})'.format(self.batch_size, world_size))
+        self.rank = rank
+        self.world_size = world_size
+        self.shard_scale = 1.
+
+        # Start every learner from the weights of rank 0
+        for model in (self.actor_local, self.actor_target, self.critic_local, self.critic_target):
+            broadcast_parameters(model)
+
+    def learn(self, experiences, gamma):
+        """Broadcast the minibatch from rank 0 and learn from this rank's shard of it.
+        Only rank 0 calls this, through step(); the other ranks are inside serve().
+        """
+        batch = torch.cat(experiences, dim=1).cpu().contiguous()
+        dist.broadcast(torch.tensor([LEARN, batch.size(0)], dtype=torch.long), 0)
+        dist.broadcast(batch, 0)
+        self.learn_shard(batch, gamma)
+
+    def learn_shard(self, batch, gamma):
+        """Update the networks from rows [lo, hi) of a flat (s, a, r, s', done) batch."""
+        size = batch.size(0)
+        lo = self.rank * size // self.world_size
+        hi = (self.rank + 1) * size // self.world_size
+
+        # The shard losses are means over hi-lo rows, weight them so that the summed gradient
+        # equals the gradient of the mean over the full batch even when P does not divide it
+        self.shard_scale = (hi - lo) / size
+
+        shard = batch[lo:hi].to(next(self.actor_local.parameters()).device)
+        s, a = self.state_size, self.action_size
+        states = shard[:, :s]
+        actions = shard[:, s:s + a]
+        rewards = shard[:, s + a:s + a + 1]
+        next_states = shard[:, s + a + 1:2 * s + a + 1]
+        dones = shard[:, 2 * s + a + 1:]
+        super(ParallelAgent, self).learn((states, actions, rewards, next_states, dones), gamma)
+
+    def reduce_gradients(self, model):
+        """Sum the weighted shard gradients of model over all ranks in one all-reduce."""
+        grads = [param.grad.data for param in model.parameters() if param.grad is not None]
+        flat = torch.cat([grad.view(-1) for grad in grads]).cpu()
+        flat.mul_(self.shard_scale)
+        dist.all_reduce(flat, op=dist.ReduceOp.SUM)
+
+        offset = 0
+        for grad in grads:
+            numel = grad.numel()
+            grad.copy_(flat[offset:offset + numel].view_as(grad))
+            offset += numel
+
+    def serve(self):
+        """Worker loop for ranks > 0: learn from every broadcast minibatch until stop() is called."""
+        width = 2 * self.state_size + self.action_size + 2
+        header = torch.zeros(2, dtype=torch.long)
+        while True:
+            dist.broadcast(header, 0)
+            if header[0].item() == STOP:
+                break
+            batch = torch.zeros(int(header[1].item()), width)
+            dist.broadcast(batch, 0)
+            self.learn_shard(batch, self.gamma)
+
+    def stop(self):
+        """Release the workers from serve(). Called by rank 0 once training is over."""
+        dist.broadcast(torch.tensor([STOP, 0], dtype=torch.long), 0)
+
+    def in_sync(self):
+        """Returns True if all local and target networks are identical across ranks."""
+        return all(parameters_in_sync(model) for model in
+                   (self.actor_local, self.actor_target, self.critic_local, self.critic_target))
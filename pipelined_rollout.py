@@ -0,0 +1,205 @@
+## Pipelined version of the ddpg() loop of ddpg_train
+## In ddpg() the environment waits while the agent runs its learning updates and the learner waits while the
+## environment simulates. Here the environment runs in its own thread and acts with a snapshot of the actor,
+## while the learner trains on the previous block of time_update steps. Transitions are handed over in blocks
+## through a queue of queue_blocks slots (1 = double buffering): counting the block it is collecting, the environment
+## is at most queue_blocks + 1 blocks ahead of the block being learned, and the snapshot is refreshed at least
+## every max_staleness learner updates. Checkpoints are written by the learner, like ddpg() after every episode.
+## Unity steps wait on a socket and torch releases the GIL in its kernels, so a thread is enough to overlap both.
+
+import copy
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from ddpg_agent_updated_v2 import device
+from ddpg_train import SOLVED_SCORE
+
+MAX_STALENESS = 10      # learner updates the acting snapshot may lag behind
+QUEUE_BLOCKS = 1        # queued blocks of transitions waiting for the learner
+SAVE = 'save'           # queue marker: the learner saves a checkpoint at the end of an episode
+
+
+class PipelinedTrainer():
+    """Overlaps environment stepping with learning for a DDPG Agent."""
+
+    def __init__(self, env, brain_name, agent, max_staleness=MAX_STALENESS, queue_blocks=QUEUE_BLOCKS, pipelined=True):
+        """Initialize a PipelinedTrainer object.
+        Params
+        ======
+            env (UnityEnvironment): environment, or standin_env.StandInEnv
+            brain_name (str)     : name of the brain controlled by agent
+            agent (Agent)        : agent acting for every agent of the brain
+            max_staleness (int)  : learner updates after which the acting snapshot is refreshed
+            queue_blocks (int)   : blocks of time_update steps queued for the learner
+            pipelined (bool)     : False runs the same loop without the thread, as ddpg() does
+        """
+        self.env = env
+        self.brain_name = brain_name
+        self.agent = agent
+        self.max_staleness = max_staleness
+        self.pipelined = pipelined
+
+        # Acting snapshot of the actor, only touched under the lock
+        self.snapshot = copy.deepcopy(agent.actor_local)
+        self.snapshot.eval()
+        self.lock = threading.Lock()
+        self.updates = 0
+        self.snapshot_version = 0
+        self.max_seen_staleness = 0
+
+        self.blocks = queue.Queue(maxsize=queue_blocks)
+        self.stop_event = threading.Event()
+        self.error = None
+
+        self.name = ''
+        self.env_steps = 0
+        self.individual_max_scores = []
+        self.mean_scores = []
+
+    def act(self, states):
+        """Returns noisy actions of the snapshot actor for all the agents."""
+        states = torch.from_numpy(states).float().to(device)
+        with self.lock:
+            with torch.no_grad():
+                actions = self.snapshot(states).cpu().data.numpy().astype(np.float64)
+            self.max_seen_staleness = max(self.max_seen_staleness, self.updates - self.snapshot_version)
+        actions += self.agent.noise.sample()
+        return np.clip(actions, -1, 1)
+
+    def publish(self):
+        """Copy the learner's actor into the acting snapshot."""
+        with self.lock:
+            self.snapshot.load_state_dict(self.agent.actor_local.state_dict())
+            self.snapshot_version = self.updates
+
+    def learn_block(self, block):
+        """Learner side: store one block of transitions and run the learning updates of Agent.update()."""
+        for transition in block:
+            self.agent.remember(*transition)
+
+        if len(self.agent.memory) > self.agent.batch_size:
+            for i in range(self.agent.learning_rate):
+                experiences = self.agent.memory.sample()
+                self.agent.learn(experiences, self.agent.gamma)
+                self.updates += 1
+                if self.updates - self.snapshot_version >= self.max_staleness:
+                    self.publish()
+
+    def _hand_over(self, block):
+        if not self.pipelined:
+            if block is SAVE:
+                self.agent.save(self.name)
+            else:
+                self.learn_block(block)
+            return
+        # Blocks while the learner is still busy with the previous blocks
+        while not self.stop_event.is_set():
+            try:
+                self.blocks.put(block, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def rollout(self, max_episodes, max_t, print_every):
+        """Environment side: play episodes with the snapshot actor, handing transitions over block by block."""
+        scores_window = deque(maxlen=print_every)
+        block = []
+        try:
+            for i_episode in range(1, max_episodes + 1):
+                env_info = self.env.reset(train_mode=True)[self.brain_name]
+                states = env_info.vector_observations
+                self.agent.reset()
+                scores = np.zeros(self.agent.num_agents)
+
+                t = 0
+                while t <= max_t and not self.stop_event.is_set():
+                    actions = self.act(states)
+                    env_info = self.env.step(actions)[self.brain_name]
+                    next_states = env_info.vector_observations
+                    rewards = env_info.rewards
+                    dones = env_info.local_done
+                    block.append((states, actions, rewards, next_states, dones))
+                    self.env_steps += 1
+
+                    # Same schedule as Agent.step: learning happens on steps t % time_update == 0
+                    if t % self.agent.time_update == 0:
+                        self._hand_over(block)
+                        block = []
+
+                    states = next_states
+                    scores += rewards
+                    t += 1
+                    if np.any(dones):
+                        break
+
+                if self.stop_event.is_set():
+                    break
+
+                last_max = np.max(scores)
+                self.individual_max_scores.append(last_max)
+                scores_window.append(last_max)
+                last_mean = np.mean(scores_window)
+                self.mean_scores.append(last_mean)
+
+                # actor_local belongs to the learner thread, which saves once it has learned the queued blocks
+                self._hand_over(SAVE)
+
+                if i_episode % print_every == 0:
+                    print('\rEpisode {}\tAverage Score: {:.4f}\tSteps/s: {:.1f}\tStaleness: {:d}'.format(i_episode, last_mean, self.steps_per_second(), self.max_seen_staleness))
+
+                if last_mean > SOLVED_SCORE and i_episode > 100:
+                    print('\nEnvironment solved in {:d} episodes!\tAverage Score: {:.2f}'.format(i_episode, last_mean))
+                    break
+        except Exception as e:
+            self.error = e
+        finally:
+            # The memory belongs to the learner, so the last partial block goes through it as well
+            if block and self.error is None:
+                self._hand_over(block)
+            if self.pipelined:
+                self._hand_over(None)
+
+    def _learn_loop(self):
+        while True:
+            block = self.blocks.get()
+            if block is None:
+                break
+            if block is SAVE:
+                self.agent.save(self.name)
+            else:
+                self.learn_block(block)
+
+    def steps_per_second(self):
+        return self.env_steps / max(time.time() - self.start_time, 1e-9)
+
+    def run(self, max_episodes=1000, max_t=2000, print_every=100, name=''):
+        """Train until solved or for max_episodes. Returns the max scores and the moving average of each episode.
+        Like ddpg(), the agent is saved as checkpoint_actor{name}.pth / checkpoint_critic{name}.pth after every
+        episode and once more at the end.
+        """
+        self.name = name
+        self.start_time = time.time()
+        if not self.pipelined:
+            self.rollout(max_episodes, max_t, print_every)
+        else:
+            env_thread = threading.Thread(target=self.rollout, args=(max_episodes, max_t, print_every), daemon=True)
+            env_thread.start()
+            try:
+                self._learn_loop()
+            except BaseException:
+                self.stop_event.set()
+                raise
+            finally:
+                env_thread.join()
+
+        if self.error is not None:
+            raise self.error
+
+        # Every block has been learned by now, including the last partial one
+        self.agent.save(self.name)
+        return self.individual_max_scores, self.mean_scores
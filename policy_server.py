@@ -0,0 +1,316 @@
+## Local inference server for trained actors
+## Game clients send single observations over a TCP or Unix socket, the server loads the actor checkpoint once,
+## gathers the requests that arrive within a short latency window into one batched forward pass and reloads
+## the checkpoint when it changes on disk without dropping requests.
+##
+## Wire format (little-endian): request  = uint32 request id, uint32 n, n float32 (the observation)
+##                              response = uint32 request id, uint32 m, m float32 (the action)
+## A request with n = 0 returns the server statistics [p50 ms, p99 ms, requests/s, mean batch size].
+## A request that cannot be served (wrong observation size, failed forward pass) gets a response with
+## m = ERROR and no payload. An observation larger than MAX_FLOATS closes the connection.
+## Usage: python policy_server.py --checkpoint checkpoint_actor.pth --port 8765
+
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+HEADER = struct.Struct('<II')
+ERROR = 0xFFFFFFFF      # response length marking a failed request
+MAX_FLOATS = 1 << 16    # larger messages are not read, the connection is closed instead
+MAX_BATCH = 64          # requests per forward pass
+MAX_DELAY = 0.002       # seconds the first request of a batch waits for company
+RELOAD_INTERVAL = 1.0   # seconds between checks of the checkpoint modification time
+STATE_SIZE = 24
+ACTION_SIZE = 2
+
+
+def percentile(latencies, q):
+    """Returns the q-th percentile of latencies (seconds) in milliseconds."""
+    if not latencies:
+        return 0.
+    return float(np.percentile(np.asarray(latencies), q)) * 1e3
+
+
+class PolicyError(Exception):
+    """The server could not serve a request."""
+    pass
+
+
+def encode(request_id, values):
+    values = np.asarray(values, dtype='<f4')
+    return HEADER.pack(request_id, values.size) + values.tobytes()
+
+
+def encode_error(request_id):
+    return HEADER.pack(request_id, ERROR)
+
+
+async def read_message(reader):
+    """Returns (request id, float32 array) of the next message, the array is None for an error response.
+    Raises IncompleteReadError on EOF and PolicyError if the message is larger than MAX_FLOATS.
+    """
+    request_id, n = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if n == ERROR:
+        return request_id, None
+    if n > MAX_FLOATS:
+        raise PolicyError('message of {} floats is too large'.format(n))
+    values = np.frombuffer(await reader.readexactly(4 * n), dtype='<f4') if n else np.zeros(0, dtype=np.float32)
+    return request_id, values
+
+
+class PolicyServer():
+    """Serves actions of an Actor checkpoint with request micro-batching and hot reload."""
+
+    def __init__(self, checkpoint, state_size=STATE_SIZE, action_size=ACTION_SIZE, max_batch=MAX_BATCH,
+                 max_delay=MAX_DELAY, reload_interval=RELOAD_INTERVAL):
+        """Initialize a PolicyServer object.
+        Params
+        ======
+            checkpoint (str)        : path of the actor state_dict, e.g. checkpoint_actor.pth
+            state_size (int)        : dimension of each state
+            action_size (int)       : dimension of each action
+            max_batch (int)         : maximum number of requests per forward pass
+            max_delay (float)       : latency window in seconds for gathering a batch (0 = no waiting)
+            reload_interval (float) : seconds between checks for a new checkpoint (0 = never reload)
+        """
+        self.checkpoint = checkpoint
+        self.state_size = state_size
+        self.action_size = action_size
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.reload_interval = reload_interval
+
+        # Forward passes and checkpoint loading run off the event loop so that sockets keep being served,
+        # each on its own thread so that a hot reload does not hold up the forward passes
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.loader = ThreadPoolExecutor(max_workers=1)
+        self.actor, self.mtime = self._load()
+        self.reloads = 0
+
+        self.queue = None
+        self.servers = []
+        self.tasks = []
+
+        # Statistics over the last requests
+        self.latencies = deque(maxlen=100000)
+        self.batch_sizes = deque(maxlen=10000)
+        self.served = 0
+        self.start_time = time.time()
+
+    def _load(self):
+        # torch is only imported by the server, PolicyClient must work without it
+        import torch
+        from model import Actor
+
+        mtime = os.stat(self.checkpoint).st_mtime
+        actor = Actor(self.state_size, self.action_size, seed=0)
+        actor.load_state_dict(torch.load(self.checkpoint, map_location='cpu'))
+        actor.eval()
+        return actor, mtime
+
+    def _forward(self, actor, states):
+        import torch
+
+        with torch.no_grad():
+            return actor(torch.from_numpy(states)).numpy()
+
+    async def start(self, host=None, port=None, path=None):
+        """Listen on a Unix socket if path is given, else on TCP host:port."""
+        self.queue = asyncio.Queue()
+        if path is not None:
+            if os.path.exists(path):
+                os.remove(path)
+            self.servers.append(await asyncio.start_unix_server(self._handle, path=path))
+        else:
+            self.servers.append(await asyncio.start_server(self._handle, host or '127.0.0.1', port))
+        self.tasks.append(asyncio.ensure_future(self._batch_loop()))
+        if self.reload_interval > 0:
+            self.tasks.append(asyncio.ensure_future(self._watch_loop()))
+        self.start_time = time.time()
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        for task in self.tasks:
+            task.cancel()
+        self.executor.shutdown(wait=False)
+        self.loader.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        """One connection: requests may be pipelined, responses are sent as they complete."""
+        loop = asyncio.get_event_loop()
+        pending = set()
+        try:
+            while True:
+                request_id, values = await read_message(reader)
+                if values is None:
+                    # ERROR is only valid in a response
+                    writer.write(encode_error(request_id))
+                    continue
+                if values.size == 0:
+                    writer.write(encode(request_id, self.stats()))
+                    continue
+                if values.size != self.state_size:
+                    # Rejected here so that a bad observation never reaches a batch
+                    writer.write(encode_error(request_id))
+                    continue
+                future = loop.create_future()
+                self.queue.put_nowait((values, future, time.perf_counter()))
+                task = asyncio.ensure_future(self._reply(writer, request_id, future))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (asyncio.IncompleteReadError, ConnectionResetError, PolicyError):
+            pass
+        finally:
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            writer.close()
+
+    async def _reply(self, writer, request_id, future):
+        try:
+            writer.write(encode(request_id, await future))
+        except Exception:
+            # The forward pass failed, tell the client instead of leaving it waiting
+            writer.write(encode_error(request_id))
+        await writer.drain()
+
+    async def _batch_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+
+            # Wait up to max_delay after the first request for more of them
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Take whatever else is already queued, it costs no waiting
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            try:
+                states = np.stack([values for values, _, _ in batch]).astype(np.float32)
+                actions = await loop.run_in_executor(self.executor, self._forward, self.actor, states)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            now = time.perf_counter()
+            for (_, future, received), action in zip(batch, actions):
+                if not future.done():
+                    future.set_result(action)
+                self.latencies.append(now - received)
+            self.batch_sizes.append(len(batch))
+            self.served += len(batch)
+
+    async def _watch_loop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                if os.stat(self.checkpoint).st_mtime == self.mtime:
+                    continue
+                # The old actor keeps serving while the new one loads on the loader thread,
+                # the swap happens here on the event loop, so between two batches
+                self.actor, self.mtime = await loop.run_in_executor(self.loader, self._load)
+                self.reloads += 1
+            except Exception:
+                # Checkpoint missing or half written, try again at the next check
+                pass
+
+    def stats(self):
+        """Returns [p50 ms, p99 ms, requests per second, mean batch size] of the server side latency."""
+        latencies = list(self.latencies)
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        mean_batch = float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.
+        return [percentile(latencies, 50), percentile(latencies, 99), self.served / elapsed, mean_batch]
+
+
+class PolicyClient():
+    """Blocking client for game loops, needs only numpy."""
+
+    def __init__(self, host='127.0.0.1', port=None, path=None):
+        """Connect to a PolicyServer on a Unix socket if path is given, else on TCP host:port."""
+        if path is not None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(path)
+        else:
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.request_id = 0
+
+    def _receive(self, size):
+        data = b''
+        while len(data) < size:
+            part = self.sock.recv(size - len(data))
+            if not part:
+                raise ConnectionError('policy server closed the connection')
+            data += part
+        return data
+
+    def _call(self, values):
+        self.request_id += 1
+        self.sock.sendall(encode(self.request_id, values))
+        request_id, n = HEADER.unpack(self._receive(HEADER.size))
+        if n == ERROR:
+            raise PolicyError('policy server could not serve request {}'.format(request_id))
+        return np.frombuffer(self._receive(4 * n), dtype='<f4')
+
+    def act(self, state):
+        """Returns the action of the served actor for one observation, raises PolicyError if it was rejected."""
+        return self._call(np.asarray(state, dtype=np.float32).reshape(-1))
+
+    def stats(self):
+        """Returns [p50 ms, p99 ms, requests per second, mean batch size] of the server."""
+        return self._call(np.zeros(0, dtype=np.float32)).tolist()
+
+    def close(self):
+        self.sock.close()
+
+
+async def serve(args):
+    server = PolicyServer(args.checkpoint, args.state_size, args.action_size, args.max_batch,
+                          args.max_delay, args.reload_interval)
+    await server.start(args.host, args.port, args.unix)
+    print('Serving {} on {}'.format(args.checkpoint, args.unix or '{}:{}'.format(args.host, args.port)))
+    while True:
+        await asyncio.sleep(args.report_every)
+        p50, p99, throughput, mean_batch = server.stats()
+        print('p50 {:.2f} ms\tp99 {:.2f} ms\t{:.0f} req/s\tmean batch {:.1f}\treloads {}'.format(
+            p50, p99, throughput, mean_batch, server.reloads))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local inference server for actor checkpoints')
+    parser.add_argument('--checkpoint', default='checkpoint_actor.pth')
+    parser.add_argument('--state-size', type=int, default=STATE_SIZE)
+    parser.add_argument('--action-size', type=int, default=ACTION_SIZE)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', default=None, help='path of a Unix socket, used instead of TCP')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-delay', type=float, default=MAX_DELAY)
+    parser.add_argument('--reload-interval', type=float, default=RELOAD_INTERVAL)
+    parser.add_argument('--report-every', type=float, default=10.)
+    args = parser.parse_args()
+
+    asyncio.get_event_loop().run_until_complete(serve(args))
+
+
+if __name__ == '__main__':
+    main()
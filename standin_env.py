@@ -0,0 +1,67 @@
+## Stand-in for the Tennis UnityEnvironment, for benchmarks and smoke tests on machines without Unity
+## It speaks the same subset of the unityagents API as the notebooks use (brain_names, brains, reset, step,
+## close) and produces Tennis-like sparse rewards. sim_time emulates the time Unity needs per step; it is spent
+## in time.sleep, which like waiting on the Unity socket releases the GIL.
+
+import time
+
+import numpy as np
+
+
+class BrainParameters():
+    def __init__(self, action_size, action_type='continuous'):
+        self.vector_action_space_size = action_size
+        self.vector_action_space_type = action_type
+
+
+class BrainInfo():
+    def __init__(self, observations, rewards, dones):
+        self.vector_observations = observations
+        self.rewards = rewards
+        self.local_done = dones
+        self.agents = list(range(len(observations)))
+
+
+class StandInEnv():
+    """Random single brain environment with the shapes and reward sparsity of Tennis."""
+
+    def __init__(self, num_agents=2, state_size=24, action_size=2, sim_time=0., hit_prob=0.01, mean_length=50, seed=0, brain_name='TennisBrain'):
+        """Initialize a StandInEnv object.
+        Params
+        ======
+            num_agents (int)    : number of agents
+            state_size (int)    : dimension of each observation
+            action_size (int)   : dimension of each action
+            sim_time (float)    : seconds spent per step, as Unity would
+            hit_prob (float)    : probability of a +0.1 reward per agent and step
+            mean_length (int)   : mean episode length in steps
+            seed (int)          : random seed
+            brain_name (str)    : name of the only brain
+        """
+        self.num_agents = num_agents
+        self.state_size = state_size
+        self.sim_time = sim_time
+        self.hit_prob = hit_prob
+        self.done_prob = 1. / mean_length
+        self.rng = np.random.RandomState(seed)
+        self.brain_names = [brain_name]
+        self.brains = {brain_name: BrainParameters(action_size)}
+
+    def _info(self, rewards, dones):
+        observations = self.rng.randn(self.num_agents, self.state_size)
+        return {self.brain_names[0]: BrainInfo(observations, rewards, dones)}
+
+    def reset(self, train_mode=True):
+        return self._info([0.] * self.num_agents, [False] * self.num_agents)
+
+    def step(self, actions):
+        if self.sim_time > 0:
+            time.sleep(self.sim_time)
+        done = self.rng.rand() < self.done_prob
+        rewards = np.where(self.rng.rand(self.num_agents) < self.hit_prob, 0.1, 0.)
+        if done:
+            rewards[self.rng.randint(self.num_agents)] = -0.01
+        return self._info(rewards.tolist(), [done] * self.num_agents)
+
+    def close(self):
+        pass
@@ -0,0 +1,202 @@
+## Recording of transitions to disk and streaming them back
+## Transitions are kept column by column (states, actions, rewards, next_states, dones, episode, agent, step)
+## and written as compressed chunks (chunk-000000.npz, chunk-000001.npz, ...) by a background thread, so the
+## environment loop only pays for a few array copies. The loader reads one chunk at a time, which lets a
+## ReplayBuffer be refilled or learn() be fed from datasets much larger than memory.
+
+import glob
+import os
+import queue
+import threading
+
+import numpy as np
+import torch
+
+from ddpg_agent_updated_v2 import device
+
+CHUNK_SIZE = 50000      # transitions per chunk file
+COLUMNS = ('states', 'actions', 'rewards', 'next_states', 'dones', 'episode', 'agent', 'step')
+
+
+def chunk_number(path):
+    """Returns the number of a chunk file, e.g. 12 for .../chunk-000012.npz."""
+    return int(os.path.basename(path)[len('chunk-'):-len('.npz')])
+
+
+class TrajectoryRecorder():
+    """Streams transitions to chunked, compressed columnar files on a background thread."""
+
+    def __init__(self, directory, chunk_size=CHUNK_SIZE, max_pending=4):
+        """Initialize a TrajectoryRecorder object.
+        Params
+        ======
+            directory (str)   : folder of the dataset, created if needed
+            chunk_size (int)  : number of transitions per chunk file
+            max_pending (int) : full chunks waiting for the writer before record() blocks
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+        # Continue after the highest chunk of an existing dataset, counting the files would reuse
+        # (and overwrite) a number if a chunk in the middle had been deleted
+        existing = [chunk_number(path) for path in glob.glob(os.path.join(directory, 'chunk-*.npz'))]
+        self.chunk_id = max(existing) + 1 if existing else 0
+        self.columns = None
+        self.size = 0
+
+        self.error = None
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def _allocate(self, state_size, action_size):
+        self.columns = {
+            'states': np.zeros((self.chunk_size, state_size), dtype=np.float32),
+            'actions': np.zeros((self.chunk_size, action_size), dtype=np.float32),
+            'rewards': np.zeros(self.chunk_size, dtype=np.float32),
+            'next_states': np.zeros((self.chunk_size, state_size), dtype=np.float32),
+            'dones': np.zeros(self.chunk_size, dtype=np.bool_),
+            'episode': np.zeros(self.chunk_size, dtype=np.int32),
+            'agent': np.zeros(self.chunk_size, dtype=np.int16),
+            'step': np.zeros(self.chunk_size, dtype=np.int32),
+        }
+        self.size = 0
+
+    def record(self, episode, time_step, states, actions, rewards, next_states, dones):
+        """Record one environment step, one row per agent."""
+        if self.error is not None:
+            raise self.error
+
+        states = np.asarray(states)
+        actions = np.asarray(actions)
+        if self.columns is None:
+            self._allocate(states.shape[1], actions.shape[1])
+
+        num_agents = states.shape[0]
+        start = 0
+        while start < num_agents:
+            n = min(num_agents - start, self.chunk_size - self.size)
+            rows = slice(self.size, self.size + n)
+            agents = slice(start, start + n)
+            self.columns['states'][rows] = states[agents]
+            self.columns['actions'][rows] = actions[agents]
+            self.columns['rewards'][rows] = np.asarray(rewards)[agents]
+            self.columns['next_states'][rows] = np.asarray(next_states)[agents]
+            self.columns['dones'][rows] = np.asarray(dones)[agents]
+            self.columns['episode'][rows] = episode
+            self.columns['agent'][rows] = np.arange(start, start + n)
+            self.columns['step'][rows] = time_step
+            self.size += n
+            start += n
+
+            if self.size == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """Hand the current (possibly partial) chunk over to the writer thread."""
+        if self.columns is None or self.size == 0:
+            return
+        chunk = {name: column[:self.size] for name, column in self.columns.items()}
+        self.pending.put((self.chunk_id, chunk))
+        self.chunk_id += 1
+
+        # Fresh buffers, the writer still owns the old ones
+        self._allocate(self.columns['states'].shape[1], self.columns['actions'].shape[1])
+
+    def _write_loop(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            chunk_id, chunk = item
+            try:
+                path = os.path.join(self.directory, 'chunk-{:06d}.npz'.format(chunk_id))
+                # Write under a temporary name so that a reader never sees a half written chunk
+                tmp = path + '.tmp'
+                with open(tmp, 'wb') as f:
+                    np.savez_compressed(f, **chunk)
+                os.replace(tmp, path)
+            except Exception as e:
+                self.error = e
+
+    def close(self):
+        """Write what is left and wait for the writer thread."""
+        self.flush()
+        self.pending.put(None)
+        self.writer.join()
+        if self.error is not None:
+            raise self.error
+
+
+class TrajectoryDataset():
+    """Reads a folder written by TrajectoryRecorder one chunk at a time."""
+
+    def __init__(self, directory):
+        """Initialize a TrajectoryDataset object.
+        Params
+        ======
+            directory (str): folder of the dataset
+        """
+        self.directory = directory
+        self.paths = sorted(glob.glob(os.path.join(directory, 'chunk-*.npz')), key=chunk_number)
+
+    def __len__(self):
+        """Return the number of chunks."""
+        return len(self.paths)
+
+    def chunks(self, columns=COLUMNS):
+        """Yield each chunk as a dict of numpy columns, only one chunk is in memory at a time."""
+        for path in self.paths:
+            with np.load(path) as data:
+                yield {name: data[name] for name in columns}
+
+    def fill_buffer(self, memory, limit=None):
+        """Add the recorded transitions to a replay buffer, oldest first.
+        Params
+        ======
+            memory: ReplayBuffer or RewardIndexedReplayBuffer
+            limit (int): stop after this many transitions (None = all of them)
+        Returns the number of transitions added.
+        """
+        added = 0
+        for chunk in self.chunks(COLUMNS[:5]):
+            n = len(chunk['rewards'])
+            if limit is not None:
+                n = min(n, limit - added)
+            for i in range(n):
+                memory.add(chunk['states'][i], chunk['actions'][i], chunk['rewards'][i],
+                           chunk['next_states'][i], chunk['dones'][i])
+            added += n
+            if limit is not None and added >= limit:
+                break
+        return added
+
+    def batches(self, batch_size, updates_per_chunk=None, seed=0):
+        """Yield (s, a, r, s', done) tensor batches sampled chunk by chunk, in the format of ReplayBuffer.sample.
+        Params
+        ======
+            batch_size (int): size of each batch
+            updates_per_chunk (int): batches drawn from each chunk (None = about one pass over the chunk)
+            seed (int): random seed
+        """
+        rng = np.random.RandomState(seed)
+        for chunk in self.chunks(COLUMNS[:5]):
+            n = len(chunk['rewards'])
+            tensors = (torch.from_numpy(chunk['states']).float(),
+                       torch.from_numpy(chunk['actions']).float(),
+                       torch.from_numpy(chunk['rewards']).float().unsqueeze(1),
+                       torch.from_numpy(chunk['next_states']).float(),
+                       torch.from_numpy(chunk['dones'].astype(np.float32)).unsqueeze(1))
+            updates = updates_per_chunk if updates_per_chunk is not None else max(1, n // batch_size)
+            for _ in range(updates):
+                idx = torch.from_numpy(rng.randint(0, n, size=batch_size))
+                yield tuple(t[idx].to(device) for t in tensors)
+
+    def learn(self, agent, updates_per_chunk=None, seed=0):
+        """Offline training: feed agent.learn() with batches of the dataset. Returns the number of updates."""
+        updates = 0
+        for experiences in self.batches(agent.batch_size, updates_per_chunk, seed):
+            agent.learn(experiences, agent.gamma)
+            updates += 1
+        return updates